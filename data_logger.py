@@ -1,59 +1,155 @@
-import pandas as pd
+import atexit
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 import os
+import queue
+import threading
+import time
+from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from eye_tracker import EyeData, GestureType
 
 
+# Column layout of the session log file
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('session_id', pa.string()),
+    ('frame_number', pa.int32()),
+    ('left_ear', pa.float32()),
+    ('right_ear', pa.float32()),
+    ('left_gaze_x', pa.float32()),
+    ('left_gaze_y', pa.float32()),
+    ('right_gaze_x', pa.float32()),
+    ('right_gaze_y', pa.float32()),
+    ('combined_gaze_x', pa.float32()),
+    ('combined_gaze_y', pa.float32()),
+    ('is_blinking', pa.bool_()),
+    ('gesture', pa.string()),
+    ('gesture_duration', pa.float32()),
+    ('fps', pa.float32())
+])
+
+# Size of the userspace write buffer in front of the log file
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Per-face measurement columns, left as NaN (written as null) when no face is found
+MEASUREMENT_COLUMNS = (
+    'left_ear', 'right_ear',
+    'left_gaze_x', 'left_gaze_y',
+    'right_gaze_x', 'right_gaze_y',
+    'combined_gaze_x', 'combined_gaze_y'
+)
+
+# Gesture string values, looked up once instead of via the enum per logged frame
+_GESTURE_VALUE = {gesture: gesture.value for gesture in GestureType}
+_GESTURE_NONE = GestureType.NONE.value
+
+# Rows read per batch when exporting the log
+EXPORT_BATCH_SIZE = 8192
+
+
 class DataLogger:
-    """Handles logging of eye tracking data to CSV files."""
+    """Handles logging of eye tracking data to Parquet files."""
     
-    def __init__(self, output_dir: str = "data"):
+    def __init__(self, output_dir: str = "data", buffer_size: int = 100,
+                 background_writes: bool = False):
         """
         Initialize the data logger.
         
         Args:
             output_dir: Directory to save log files
+            buffer_size: Number of records buffered before each write
+            background_writes: Serialize and write full buffers on a daemon
+                thread instead of the calling (capture) thread
         """
         self.output_dir = output_dir
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.log_file = None
-        self.data_buffer = []
-        self.buffer_size = 100  # Flush to file every 100 records
+        self._fh = None
+        self._writer = None
+        self.buffer_size = buffer_size  # Flush to file every buffer_size records
+        
+        # Column buffers (one array per logged column) and write cursor. The lock
+        # serializes logging from the capture thread with close() from the UI thread
+        self._buf = self._allocate_buffer(self.buffer_size)
+        self._cursor = 0
+        self._lock = threading.Lock()
+        
+        # Running session statistics, updated in O(1) per logged frame
+        self._stats = {
+            'total_frames': 0,
+            'frames_with_face': 0,
+            'total_blinks': 0,
+            'fps_sum': 0.0,
+            'gesture_counts': Counter()
+        }
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
         # Initialize logging
         self._initialize_logging()
+        
+        # Optional writer thread fed with full buffers
+        self._write_queue: Optional[queue.Queue] = None
+        self._write_thread: Optional[threading.Thread] = None
+        if background_writes:
+            self._write_queue = queue.Queue()
+            self._write_thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._write_thread.start()
+    
+    @staticmethod
+    def _allocate_buffer(size: int) -> Dict[str, np.ndarray]:
+        """Allocate one fixed-size array per buffered column, pre-filled as no-face rows."""
+        buf = {
+            'timestamp': np.empty(size, dtype=np.int64),  # Unix epoch microseconds
+            'frame_number': np.empty(size, dtype=np.int32),
+            'left_ear': np.empty(size, dtype=np.float32),
+            'right_ear': np.empty(size, dtype=np.float32),
+            'left_gaze_x': np.empty(size, dtype=np.float32),
+            'left_gaze_y': np.empty(size, dtype=np.float32),
+            'right_gaze_x': np.empty(size, dtype=np.float32),
+            'right_gaze_y': np.empty(size, dtype=np.float32),
+            'combined_gaze_x': np.empty(size, dtype=np.float32),
+            'combined_gaze_y': np.empty(size, dtype=np.float32),
+            'is_blinking': np.empty(size, dtype=np.bool_),
+            'gesture': np.empty(size, dtype=object),
+            'gesture_duration': np.empty(size, dtype=np.float32),
+            'fps': np.empty(size, dtype=np.float32)
+        }
+        DataLogger._reset_buffer(buf, size)
+        return buf
+    
+    @staticmethod
+    def _reset_buffer(buf: Dict[str, np.ndarray], n: int):
+        """Restore the first n rows to no-face defaults."""
+        for name in MEASUREMENT_COLUMNS:
+            buf[name][:n] = np.nan
+        buf['is_blinking'][:n] = False
+        buf['gesture'][:n] = _GESTURE_NONE
+        buf['gesture_duration'][:n] = 0.0
     
     def _initialize_logging(self):
-        """Initialize the CSV log file."""
+        """Initialize the Parquet log file."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = os.path.join(self.output_dir, f"eye_tracking_session_{timestamp}.csv")
-        
-        # Create DataFrame with column headers
-        columns = [
-            'timestamp',
-            'session_id',
-            'frame_number',
-            'left_ear',
-            'right_ear',
-            'left_gaze_x',
-            'left_gaze_y',
-            'right_gaze_x',
-            'right_gaze_y',
-            'combined_gaze_x',
-            'combined_gaze_y',
-            'is_blinking',
-            'gesture',
-            'gesture_duration',
-            'fps'
-        ]
-        
-        # Create empty CSV file with headers
-        df = pd.DataFrame(columns=columns)
-        df.to_csv(self.log_file, index=False)
+        self.log_file = os.path.join(self.output_dir, f"eye_tracking_session_{timestamp}.parquet")
+        
+        # Keep a single writer open for the whole session; each flush
+        # appends one row group instead of re-opening the file. The large
+        # userspace buffer coalesces the many small page writes into few syscalls
+        self._fh = open(self.log_file, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._writer = pq.ParquetWriter(self._fh, SCHEMA, compression='snappy')
+        
+        # Convert an empty column once so pyarrow's lazy imports run now: close() may be
+        # called at interpreter exit, when new modules can no longer register cleanup hooks
+        pa.array(np.empty(0, dtype=np.float32))
+        
+        # A Parquet file is only readable once close() has written its footer, so make
+        # sure that also happens when the interpreter exits without an explicit close
+        atexit.register(self.close)
         
         print(f"Data logging initialized: {self.log_file}")
     
@@ -68,31 +164,39 @@ class DataLogger:
             fps: Current FPS
             gesture_duration: Duration of current gesture (if any)
         """
-        timestamp = datetime.now().isoformat()
-        
-        log_entry = {
-            'timestamp': timestamp,
-            'session_id': self.session_id,
-            'frame_number': frame_number,
-            'left_ear': eye_data.left_ear,
-            'right_ear': eye_data.right_ear,
-            'left_gaze_x': eye_data.left_gaze[0],
-            'left_gaze_y': eye_data.left_gaze[1],
-            'right_gaze_x': eye_data.right_gaze[0],
-            'right_gaze_y': eye_data.right_gaze[1],
-            'combined_gaze_x': eye_data.combined_gaze[0],
-            'combined_gaze_y': eye_data.combined_gaze[1],
-            'is_blinking': eye_data.is_blinking,
-            'gesture': eye_data.gesture.value,
-            'gesture_duration': gesture_duration,
-            'fps': fps
-        }
-        
-        self.data_buffer.append(log_entry)
-        
-        # Flush buffer if it's full
-        if len(self.data_buffer) >= self.buffer_size:
-            self._flush_buffer()
+        with self._lock:
+            buf = self._buf
+            i = self._cursor
+            
+            buf['timestamp'][i] = time.time_ns() // 1000
+            buf['frame_number'][i] = frame_number
+            buf['left_ear'][i] = eye_data.left_ear
+            buf['right_ear'][i] = eye_data.right_ear
+            buf['left_gaze_x'][i] = eye_data.left_gaze[0]
+            buf['left_gaze_y'][i] = eye_data.left_gaze[1]
+            buf['right_gaze_x'][i] = eye_data.right_gaze[0]
+            buf['right_gaze_y'][i] = eye_data.right_gaze[1]
+            buf['combined_gaze_x'][i] = eye_data.combined_gaze[0]
+            buf['combined_gaze_y'][i] = eye_data.combined_gaze[1]
+            buf['is_blinking'][i] = eye_data.is_blinking
+            gesture = _GESTURE_VALUE[eye_data.gesture]
+            buf['gesture'][i] = gesture
+            buf['gesture_duration'][i] = gesture_duration
+            buf['fps'][i] = fps
+            self._cursor = i + 1
+            
+            # Update running statistics
+            stats = self._stats
+            stats['total_frames'] += 1
+            stats['frames_with_face'] += 1
+            if eye_data.is_blinking:
+                stats['total_blinks'] += 1
+            stats['fps_sum'] += fps
+            stats['gesture_counts'][gesture] += 1
+            
+            # Flush buffer if it's full
+            if self._cursor >= self.buffer_size:
+                self._flush_buffer()
     
     def log_no_face_detected(self, frame_number: int, fps: float = 0.0) -> None:
         """
@@ -102,43 +206,69 @@ class DataLogger:
             frame_number: Current frame number
             fps: Current FPS
         """
-        timestamp = datetime.now().isoformat()
-        
-        log_entry = {
-            'timestamp': timestamp,
-            'session_id': self.session_id,
-            'frame_number': frame_number,
-            'left_ear': None,
-            'right_ear': None,
-            'left_gaze_x': None,
-            'left_gaze_y': None,
-            'right_gaze_x': None,
-            'right_gaze_y': None,
-            'combined_gaze_x': None,
-            'combined_gaze_y': None,
-            'is_blinking': False,
-            'gesture': GestureType.NONE.value,
-            'gesture_duration': 0.0,
-            'fps': fps
-        }
-        
-        self.data_buffer.append(log_entry)
-        
-        # Flush buffer if it's full
-        if len(self.data_buffer) >= self.buffer_size:
-            self._flush_buffer()
+        with self._lock:
+            buf = self._buf
+            i = self._cursor
+            
+            # Buffer rows start out as no-face rows (NaN measurements, no gesture),
+            # so only the per-frame fields need writing
+            buf['timestamp'][i] = time.time_ns() // 1000
+            buf['frame_number'][i] = frame_number
+            buf['fps'][i] = fps
+            self._cursor = i + 1
+            
+            # Update running statistics
+            stats = self._stats
+            stats['total_frames'] += 1
+            stats['fps_sum'] += fps
+            stats['gesture_counts'][_GESTURE_NONE] += 1
+            
+            # Flush buffer if it's full
+            if self._cursor >= self.buffer_size:
+                self._flush_buffer()
     
     def _flush_buffer(self):
-        """Flush the data buffer to the CSV file."""
-        if not self.data_buffer:
+        """Flush the data buffer to the Parquet file. Callers hold self._lock."""
+        n = self._cursor
+        if n == 0:
+            return
+        if self._writer is None:
+            # Logger already closed (e.g. a late frame from a processing thread): discard the rows
+            self._reset_buffer(self._buf, n)
+            self._cursor = 0
             return
         
-        # Convert buffer to DataFrame and append to CSV
-        df = pd.DataFrame(self.data_buffer)
-        df.to_csv(self.log_file, mode='a', header=False, index=False)
+        if self._write_queue is not None:
+            # Hand the filled buffer to the writer thread and continue with a fresh one
+            self._write_queue.put((self._buf, n))
+            self._buf = self._allocate_buffer(self.buffer_size)
+        else:
+            self._write_buffer(self._buf, n)
+            self._reset_buffer(self._buf, n)
         
-        # Clear buffer
-        self.data_buffer.clear()
+        # Reset write cursor
+        self._cursor = 0
+    
+    def _write_buffer(self, buf: Dict[str, np.ndarray], n: int):
+        """Write the first n rows of a column buffer as a single record batch."""
+        columns = []
+        for field in SCHEMA:
+            if field.name == 'session_id':
+                columns.append(pa.array([self.session_id] * n, type=field.type))
+            else:
+                columns.append(pa.array(buf[field.name][:n], type=field.type, from_pandas=True))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=SCHEMA))
+    
+    def _write_loop(self):
+        """Background thread body: write queued buffers until the stop sentinel."""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                break
+            try:
+                self._write_buffer(*item)
+            except Exception as e:
+                print(f"Error writing log data: {e}")
     
     def log_session_summary(self, total_frames: int, total_blinks: int, 
                            gesture_counts: Dict[str, int], avg_fps: float) -> None:
@@ -173,33 +303,64 @@ class DataLogger:
         """
         Get basic statistics for the current session.
         
+        Statistics are kept as running counters, so this is cheap to call
+        mid-session and does not read the log file.
+        
         Returns:
             Dictionary with session statistics
         """
+        stats = self._stats
+        total_frames = stats['total_frames']
+        
+        return {
+            'total_frames': total_frames,
+            'frames_with_face': stats['frames_with_face'],
+            'total_blinks': stats['total_blinks'],
+            'avg_fps': stats['fps_sum'] / total_frames if total_frames else 0.0,
+            'gesture_counts': dict(stats['gesture_counts'])
+        }
+    
+    def export_to_csv(self, output_file: Optional[str] = None) -> str:
+        """
+        Export the session data to a CSV file.
+        
+        Row groups are streamed from the Parquet log through pyarrow's CSV
+        writer, which serializes whole columns in C. Requires a closed log file.
+        
+        Args:
+            output_file: Optional custom output filename
+            
+        Returns:
+            Path to the exported CSV file
+        """
         if not os.path.exists(self.log_file):
-            return {}
+            raise FileNotFoundError("No log file found to export")
+        
+        if output_file is None:
+            output_file = os.path.join(self.output_dir, f"eye_tracking_data_{self.session_id}.csv")
         
         try:
-            df = pd.read_csv(self.log_file)
-            
-            stats = {
-                'total_frames': len(df),
-                'frames_with_face': len(df[df['left_ear'].notna()]),
-                'total_blinks': df['is_blinking'].sum() if 'is_blinking' in df.columns else 0,
-                'avg_fps': df['fps'].mean() if 'fps' in df.columns else 0,
-                'gesture_counts': df['gesture'].value_counts().to_dict() if 'gesture' in df.columns else {}
-            }
+            parquet_file = pq.ParquetFile(self.log_file)
+            with pcsv.CSVWriter(output_file, parquet_file.schema_arrow) as writer:
+                for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_SIZE):
+                    writer.write_batch(batch)
             
-            return stats
+            print(f"Data exported to CSV: {output_file}")
+            return output_file
             
         except Exception as e:
-            print(f"Error reading session stats: {e}")
-            return {}
+            print(f"Error exporting to CSV: {e}")
+            raise
     
     def export_to_excel(self, output_file: Optional[str] = None) -> str:
         """
         Export the session data to an Excel file.
         
+        Row groups are streamed from the Parquet log into an xlsxwriter
+        workbook in constant-memory mode, so the session is never fully
+        loaded. Requires the optional ``xlsxwriter`` package and a closed
+        log file.
+        
         Args:
             output_file: Optional custom output filename
             
@@ -213,8 +374,25 @@ class DataLogger:
             output_file = os.path.join(self.output_dir, f"eye_tracking_data_{self.session_id}.xlsx")
         
         try:
-            df = pd.read_csv(self.log_file)
-            df.to_excel(output_file, index=False)
+            import xlsxwriter
+            
+            parquet_file = pq.ParquetFile(self.log_file)
+            workbook = xlsxwriter.Workbook(output_file, {
+                'constant_memory': True,
+                'remove_timezone': True,
+                'default_date_format': 'yyyy-mm-dd hh:mm:ss.000'
+            })
+            worksheet = workbook.add_worksheet()
+            worksheet.write_row(0, 0, parquet_file.schema_arrow.names)
+            
+            # Rows must be written in order in constant-memory mode
+            row = 1
+            for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_SIZE):
+                for record in zip(*(column.to_pylist() for column in batch.columns)):
+                    worksheet.write_row(row, 0, record)
+                    row += 1
+            workbook.close()
+            
             print(f"Data exported to Excel: {output_file}")
             return output_file
             
@@ -224,7 +402,20 @@ class DataLogger:
     
     def close(self):
         """Close the logger and flush any remaining data."""
-        self._flush_buffer()
+        with self._lock:
+            if self._writer is None:
+                return
+            atexit.unregister(self.close)
+            self._flush_buffer()
+            if self._write_thread is not None:
+                # Let the writer thread drain pending buffers before closing the file
+                self._write_queue.put(None)
+                self._write_thread.join()
+                self._write_thread = None
+            self._writer.close()
+            self._writer = None
+            self._fh.close()
+            self._fh = None
         print(f"Data logging completed. Session data saved to: {self.log_file}")
     
     def __enter__(self):
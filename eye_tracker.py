@@ -1,10 +1,16 @@
+import math
 import cv2
 import mediapipe as mp
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the kernels below then run as plain Python
+    njit = None
+
 
 class GestureType(Enum):
     """Eye gesture types."""
@@ -15,6 +21,112 @@ class GestureType(Enum):
     SUSTAINED_GAZE = "sustained_gaze"
 
 
+# Integer gesture codes returned by the landmark kernels
+_GESTURE_TYPES = (
+    GestureType.NONE,
+    GestureType.LEFT_WINK,
+    GestureType.RIGHT_WINK,
+    GestureType.DOUBLE_BLINK,
+    GestureType.SUSTAINED_GAZE
+)
+
+
+def _jit(func):
+    """Compile a kernel with numba when it is installed, otherwise return it unchanged."""
+    if njit is None:
+        return func
+    return njit(cache=True, fastmath=True)(func)
+
+
+@_jit
+def _ear_kernel(pts, idx):
+    """EAR from the six landmarks pts[idx] (p1..p6)."""
+    vertical_1 = math.hypot(float(pts[idx[1], 0] - pts[idx[5], 0]), float(pts[idx[1], 1] - pts[idx[5], 1]))
+    vertical_2 = math.hypot(float(pts[idx[2], 0] - pts[idx[4], 0]), float(pts[idx[2], 1] - pts[idx[4], 1]))
+    horizontal = math.hypot(float(pts[idx[0], 0] - pts[idx[3], 0]), float(pts[idx[0], 1] - pts[idx[3], 1]))
+    if horizontal == 0:
+        return 0.0
+    return (vertical_1 + vertical_2) / (2.0 * horizontal)
+
+
+@_jit
+def _detect_gesture_kernel(left_ear, right_ear, current_time, ear_threshold, wink_min, wink_max, state):
+    """
+    Gesture state machine.
+    
+    state holds [left_eye_closed_time, right_eye_closed_time, last_blink_time, blink_count]
+    and is updated in place. Returns an index into _GESTURE_TYPES.
+    """
+    left_closed = left_ear < ear_threshold
+    right_closed = right_ear < ear_threshold
+    
+    # Update eye closed times
+    if left_closed:
+        if state[0] == 0:
+            state[0] = current_time
+    else:
+        state[0] = 0.0
+        
+    if right_closed:
+        if state[1] == 0:
+            state[1] = current_time
+    else:
+        state[1] = 0.0
+    
+    # Detect gestures
+    if left_closed and not right_closed:
+        if state[0] > 0:
+            duration = current_time - state[0]
+            if wink_min <= duration <= wink_max:
+                return 1
+                
+    elif right_closed and not left_closed:
+        if state[1] > 0:
+            duration = current_time - state[1]
+            if wink_min <= duration <= wink_max:
+                return 2
+                
+    elif left_closed and right_closed:
+        # Both eyes closed - check for double blink
+        if current_time - state[2] < 0.5:  # Within 0.5 seconds
+            state[3] += 1
+            if state[3] >= 2:
+                state[3] = 0
+                return 3
+        else:
+            state[3] = 1
+        state[2] = current_time
+    
+    return 0
+
+
+@_jit
+def _process_landmarks(pts, left_ear_idx, right_ear_idx, left_eye_idx, right_eye_idx,
+                       inv_w, inv_h, ear_threshold, wink_min, wink_max,
+                       current_time, state):
+    """
+    Fused per-frame EAR, gaze, blink and gesture computation.
+    
+    Returns (left_ear, right_ear, left_gaze_x, left_gaze_y, right_gaze_x, right_gaze_y,
+    is_blinking, gesture_code).
+    """
+    left_ear = _ear_kernel(pts, left_ear_idx)
+    right_ear = _ear_kernel(pts, right_ear_idx)
+    
+    # Gaze from the second landmark of each eye, normalized by the reciprocal frame size
+    left_gaze_x = pts[left_eye_idx[1], 0] * inv_w
+    left_gaze_y = pts[left_eye_idx[1], 1] * inv_h
+    right_gaze_x = pts[right_eye_idx[1], 0] * inv_w
+    right_gaze_y = pts[right_eye_idx[1], 1] * inv_h
+    
+    is_blinking = left_ear < ear_threshold or right_ear < ear_threshold
+    gesture_code = _detect_gesture_kernel(left_ear, right_ear, current_time, ear_threshold,
+                                          wink_min, wink_max, state)
+    
+    return (left_ear, right_ear, left_gaze_x, left_gaze_y, right_gaze_x, right_gaze_y,
+            is_blinking, gesture_code)
+
+
 @dataclass
 class EyeData:
     """Container for eye tracking data."""
@@ -25,7 +137,7 @@ class EyeData:
     combined_gaze: Tuple[float, float]
     is_blinking: bool
     gesture: GestureType
-    landmarks: Optional[List[Tuple[int, int]]] = None
+    landmarks: Optional[np.ndarray] = None  # (N, 2) int32 pixel coordinates
 
 
 class EyeTracker:
@@ -34,18 +146,27 @@ class EyeTracker:
     # MediaPipe face mesh landmark indices for eyes
     LEFT_EYE_INDICES = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
     RIGHT_EYE_INDICES = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
+    LEFT_EYE_IDX_ARR = np.asarray(LEFT_EYE_INDICES, dtype=np.int32)
+    RIGHT_EYE_IDX_ARR = np.asarray(RIGHT_EYE_INDICES, dtype=np.int32)
     
     # Key eye landmark indices for EAR calculation
     LEFT_EAR_INDICES = [33, 160, 158, 133, 153, 144]
     RIGHT_EAR_INDICES = [362, 385, 387, 263, 373, 380]
     
-    def __init__(self, ear_threshold: float = 0.25, wink_duration: Tuple[float, float] = (0.2, 0.5)):
+    # Side length of the grayscale thumbnail used by the motion gate
+    MOTION_THUMB_SIZE = 32
+    
+    def __init__(self, ear_threshold: float = 0.25, wink_duration: Tuple[float, float] = (0.2, 0.5),
+                 motion_threshold: float = 0.0):
         """
         Initialize the eye tracker.
         
         Args:
             ear_threshold: Threshold for blink detection (lower = more sensitive)
             wink_duration: Min and max duration for wink detection in seconds
+            motion_threshold: Mean absolute gray-level change (per pixel of a 32x32
+                thumbnail) below which the previous result is reused instead of
+                running MediaPipe again; 0 disables the gate
         """
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mp_drawing = mp.solutions.drawing_utils
@@ -62,84 +183,102 @@ class EyeTracker:
         
         self.ear_threshold = ear_threshold
         self.wink_duration = wink_duration
+        self.motion_threshold = motion_threshold
+        
+        # Motion gate state: thumbnail and result of the last fully processed frame
+        self._prev_small = None
+        self._cached_eye_data: Optional[EyeData] = None
+        
+        # Landmark index arrays for vectorized lookups
+        self._left_ear_idx = np.asarray(self.LEFT_EAR_INDICES, dtype=np.int32)
+        self._right_ear_idx = np.asarray(self.RIGHT_EAR_INDICES, dtype=np.int32)
+        self._left_eye_idx = self.LEFT_EYE_IDX_ARR
+        self._right_eye_idx = self.RIGHT_EYE_IDX_ARR
+        
+        # EAR point pairs (p2-p6, p3-p5, p1-p4) as (from, to) landmark index arrays
+        self._left_ear_pairs = (self._left_ear_idx[[1, 2, 0]], self._left_ear_idx[[5, 4, 3]])
+        self._right_ear_pairs = (self._right_ear_idx[[1, 2, 0]], self._right_ear_idx[[5, 4, 3]])
         
-        # Gesture detection state
-        self.left_eye_closed_time = 0
-        self.right_eye_closed_time = 0
-        self.last_blink_time = 0
-        self.blink_count = 0
-        self.gaze_history = []
+        # Gesture detection state:
+        # [left_eye_closed_time, right_eye_closed_time, last_blink_time, blink_count]
+        self._gesture_state = np.zeros(4, dtype=np.float64)
         self.gaze_history_max = 30  # frames
         
+        # Gaze history ring buffer: _gaze_head is the next write slot
+        self.gaze_history = np.zeros((self.gaze_history_max, 2), dtype=np.float32)
+        self._gaze_head = 0
+        self._gaze_len = 0
+        
         # Frame dimensions (set when first frame is processed)
         self.frame_width = 0
         self.frame_height = 0
+        self._scale = np.zeros(2, dtype=np.float64)  # (width, height) for landmark scaling
+        self._inv_w = 0.0
+        self._inv_h = 0.0
+        
+        # Reused RGB conversion target for MediaPipe input
+        self._rgb_buf = None
         
     def set_frame_dimensions(self, width: int, height: int):
         """Set frame dimensions for coordinate normalization."""
         self.frame_width = width
         self.frame_height = height
+        self._scale = np.array([width, height], dtype=np.float64)
+        self._inv_w = 1.0 / width
+        self._inv_h = 1.0 / height
+        self._rgb_buf = np.empty((height, width, 3), dtype=np.uint8)
     
-    def calculate_ear(self, landmarks: List[Tuple[int, int]], eye_indices: List[int]) -> float:
+    def calculate_ear(self, landmarks: np.ndarray, eye_indices: np.ndarray) -> float:
         """
         Calculate Eye Aspect Ratio (EAR) for blink detection.
         
         Args:
-            landmarks: List of landmark coordinates
-            eye_indices: Indices for EAR calculation points
+            landmarks: Landmark pixel coordinates, shape (N, 2)
+            eye_indices: Indices of the six EAR points (p1..p6)
             
         Returns:
             EAR value
         """
         if len(landmarks) < max(eye_indices) + 1:
             return 0.0
-            
-        # Extract eye landmark points
-        p1 = landmarks[eye_indices[0]]  # Top
-        p2 = landmarks[eye_indices[1]]  # Bottom
-        p3 = landmarks[eye_indices[2]]  # Left
-        p4 = landmarks[eye_indices[3]]  # Right
-        p5 = landmarks[eye_indices[4]]  # Inner corner
-        p6 = landmarks[eye_indices[5]]  # Outer corner
+        return float(_ear_kernel(np.asarray(landmarks), np.asarray(eye_indices)))
+    
+    def _calculate_ear_vec(self, pts: np.ndarray, ear_pairs: Tuple[np.ndarray, np.ndarray]) -> float:
+        """
+        Calculate EAR on an (N, 2) landmark array in one vectorized step.
         
-        # Calculate distances
-        vertical_1 = np.linalg.norm(np.array(p2) - np.array(p6))
-        vertical_2 = np.linalg.norm(np.array(p3) - np.array(p5))
-        horizontal = np.linalg.norm(np.array(p1) - np.array(p4))
+        Args:
+            pts: Landmark pixel coordinates, shape (N, 2)
+            ear_pairs: (from, to) index arrays for the p2-p6, p3-p5 and p1-p4 distances
+            
+        Returns:
+            EAR value
+        """
+        # One gathered subtract and one sqrt for all three distances
+        d = np.take(pts, ear_pairs[0], axis=0) - np.take(pts, ear_pairs[1], axis=0)
+        vertical_1, vertical_2, horizontal = np.sqrt((d * d).sum(axis=1))
         
-        # Calculate EAR
         if horizontal == 0:
             return 0.0
-        ear = (vertical_1 + vertical_2) / (2.0 * horizontal)
-        return ear
+        return float((vertical_1 + vertical_2) / (2.0 * horizontal))
     
-    def calculate_gaze(self, landmarks: List[Tuple[int, int]], eye_indices: List[int]) -> Tuple[float, float]:
+    def calculate_gaze(self, landmarks: np.ndarray, eye_indices: np.ndarray) -> Tuple[float, float]:
         """
         Calculate gaze direction for an eye.
         
+        Expects the full MediaPipe landmark set and frame dimensions already
+        set via set_frame_dimensions().
+        
         Args:
-            landmarks: List of landmark coordinates
+            landmarks: Landmark pixel coordinates, shape (N, 2)
             eye_indices: Eye landmark indices
             
         Returns:
             Normalized gaze coordinates (x, y) in range [0, 1]
         """
-        if len(landmarks) < max(eye_indices) + 1:
-            return (0.5, 0.5)
-        
-        # Get eye center and iris position
-        eye_center = landmarks[eye_indices[0]]  # Use first landmark as reference
-        iris_center = landmarks[eye_indices[1]]  # Use second landmark as iris
-        
-        # Calculate relative position
-        if self.frame_width > 0 and self.frame_height > 0:
-            gaze_x = iris_center[0] / self.frame_width
-            gaze_y = iris_center[1] / self.frame_height
-        else:
-            gaze_x = 0.5
-            gaze_y = 0.5
-            
-        return (gaze_x, gaze_y)
+        # Second eye landmark is used as the iris position
+        iris_x, iris_y = landmarks[eye_indices[1]]
+        return (iris_x * self._inv_w, iris_y * self._inv_h)
     
     def detect_gesture(self, left_ear: float, right_ear: float, current_time: float) -> GestureType:
         """
@@ -153,47 +292,10 @@ class EyeTracker:
         Returns:
             Detected gesture type
         """
-        left_closed = left_ear < self.ear_threshold
-        right_closed = right_ear < self.ear_threshold
-        
-        # Update eye closed times
-        if left_closed:
-            if self.left_eye_closed_time == 0:
-                self.left_eye_closed_time = current_time
-        else:
-            self.left_eye_closed_time = 0
-            
-        if right_closed:
-            if self.right_eye_closed_time == 0:
-                self.right_eye_closed_time = current_time
-        else:
-            self.right_eye_closed_time = 0
-        
-        # Detect gestures
-        if left_closed and not right_closed:
-            if self.left_eye_closed_time > 0:
-                duration = current_time - self.left_eye_closed_time
-                if self.wink_duration[0] <= duration <= self.wink_duration[1]:
-                    return GestureType.LEFT_WINK
-                    
-        elif right_closed and not left_closed:
-            if self.right_eye_closed_time > 0:
-                duration = current_time - self.right_eye_closed_time
-                if self.wink_duration[0] <= duration <= self.wink_duration[1]:
-                    return GestureType.RIGHT_WINK
-                    
-        elif left_closed and right_closed:
-            # Both eyes closed - check for double blink
-            if current_time - self.last_blink_time < 0.5:  # Within 0.5 seconds
-                self.blink_count += 1
-                if self.blink_count >= 2:
-                    self.blink_count = 0
-                    return GestureType.DOUBLE_BLINK
-            else:
-                self.blink_count = 1
-            self.last_blink_time = current_time
-        
-        return GestureType.NONE
+        code = _detect_gesture_kernel(left_ear, right_ear, current_time, self.ear_threshold,
+                                      self.wink_duration[0], self.wink_duration[1],
+                                      self._gesture_state)
+        return _GESTURE_TYPES[code]
     
     def process_frame(self, frame: np.ndarray, timestamp: float = 0.0) -> Optional[EyeData]:
         """
@@ -209,11 +311,29 @@ class EyeTracker:
         if self.frame_width == 0 or self.frame_height == 0:
             self.set_frame_dimensions(frame.shape[1], frame.shape[0])
         
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.motion_threshold > 0:
+            # Reuse the last result when the frame barely changed (SAD on a small thumbnail)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            small = cv2.resize(gray, (self.MOTION_THUMB_SIZE, self.MOTION_THUMB_SIZE),
+                               interpolation=cv2.INTER_AREA)
+            if (self._prev_small is not None and
+                    cv2.norm(small, self._prev_small, cv2.NORM_L1) < self.motion_threshold * small.size):
+                return self._cached_eye_data
+            self._prev_small = small
+            self._cached_eye_data = self._track_frame(frame, timestamp)
+            return self._cached_eye_data
+        
+        return self._track_frame(frame, timestamp)
+    
+    def _track_frame(self, frame: np.ndarray, timestamp: float) -> Optional[EyeData]:
+        """Run MediaPipe and the landmark computations on a single frame."""
+        # Convert BGR to RGB into the reused buffer (reallocated if the frame size changes)
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
         
         # Process with MediaPipe
-        results = self.face_mesh.process(rgb_frame)
+        results = self.face_mesh.process(self._rgb_buf)
         
         if not results.multi_face_landmarks:
             return None
@@ -221,20 +341,38 @@ class EyeTracker:
         # Get the first face
         face_landmarks = results.multi_face_landmarks[0]
         
-        # Convert landmarks to pixel coordinates
-        landmarks = []
-        for landmark in face_landmarks.landmark:
-            x = int(landmark.x * self.frame_width)
-            y = int(landmark.y * self.frame_height)
-            landmarks.append((x, y))
+        # Convert all landmarks to pixel coordinates in one vectorized step
+        pts = np.array([(lm.x, lm.y) for lm in face_landmarks.landmark], dtype=np.float64)
+        pts *= self._scale
+        pts = pts.astype(np.int32)
         
-        # Calculate EAR for both eyes
-        left_ear = self.calculate_ear(landmarks, self.LEFT_EAR_INDICES)
-        right_ear = self.calculate_ear(landmarks, self.RIGHT_EAR_INDICES)
-        
-        # Calculate gaze directions
-        left_gaze = self.calculate_gaze(landmarks, self.LEFT_EYE_INDICES)
-        right_gaze = self.calculate_gaze(landmarks, self.RIGHT_EYE_INDICES)
+        if njit is not None:
+            # Single compiled call for EAR, gaze, blink and gesture detection
+            (left_ear, right_ear, left_gaze_x, left_gaze_y, right_gaze_x, right_gaze_y,
+             is_blinking, gesture_code) = _process_landmarks(
+                pts, self._left_ear_idx, self._right_ear_idx,
+                self._left_eye_idx, self._right_eye_idx,
+                self._inv_w, self._inv_h, self.ear_threshold,
+                self.wink_duration[0], self.wink_duration[1],
+                timestamp, self._gesture_state
+            )
+            left_gaze = (left_gaze_x, left_gaze_y)
+            right_gaze = (right_gaze_x, right_gaze_y)
+            gesture = _GESTURE_TYPES[gesture_code]
+        else:
+            # Calculate EAR for both eyes
+            left_ear = self._calculate_ear_vec(pts, self._left_ear_pairs)
+            right_ear = self._calculate_ear_vec(pts, self._right_ear_pairs)
+            
+            # Calculate gaze directions
+            left_gaze = self.calculate_gaze(pts, self._left_eye_idx)
+            right_gaze = self.calculate_gaze(pts, self._right_eye_idx)
+            
+            # Detect blinking
+            is_blinking = left_ear < self.ear_threshold or right_ear < self.ear_threshold
+            
+            # Detect gestures
+            gesture = self.detect_gesture(left_ear, right_ear, timestamp)
         
         # Calculate combined gaze (average of both eyes)
         combined_gaze = (
@@ -243,15 +381,10 @@ class EyeTracker:
         )
         
         # Update gaze history
-        self.gaze_history.append(combined_gaze)
-        if len(self.gaze_history) > self.gaze_history_max:
-            self.gaze_history.pop(0)
-        
-        # Detect blinking
-        is_blinking = left_ear < self.ear_threshold or right_ear < self.ear_threshold
-        
-        # Detect gestures
-        gesture = self.detect_gesture(left_ear, right_ear, timestamp)
+        self.gaze_history[self._gaze_head] = combined_gaze
+        self._gaze_head = (self._gaze_head + 1) % self.gaze_history_max
+        if self._gaze_len < self.gaze_history_max:
+            self._gaze_len += 1
         
         return EyeData(
             left_ear=left_ear,
@@ -261,20 +394,24 @@ class EyeTracker:
             combined_gaze=combined_gaze,
             is_blinking=is_blinking,
             gesture=gesture,
-            landmarks=landmarks
+            landmarks=pts
         )
     
-    def get_gaze_history(self) -> List[Tuple[float, float]]:
-        """Get recent gaze history."""
-        return self.gaze_history.copy()
+    def get_gaze_history(self) -> np.ndarray:
+        """Get recent gaze history as an (N, 2) array, oldest first."""
+        if self._gaze_len < self.gaze_history_max:
+            return self.gaze_history[:self._gaze_len].copy()
+        # Full ring: the oldest entry sits at the write head
+        return np.concatenate((self.gaze_history[self._gaze_head:],
+                               self.gaze_history[:self._gaze_head]))
     
     def reset_metrics(self):
         """Reset tracking metrics."""
-        self.left_eye_closed_time = 0
-        self.right_eye_closed_time = 0
-        self.last_blink_time = 0
-        self.blink_count = 0
-        self.gaze_history.clear()
+        self._gesture_state.fill(0)
+        self._gaze_head = 0
+        self._gaze_len = 0
+        self._prev_small = None
+        self._cached_eye_data = None
     
     def release(self):
         """Release MediaPipe resources."""
@@ -1,3 +1,4 @@
+import queue
 import threading
 import time
 import cv2
@@ -5,8 +6,7 @@ import numpy as np
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter import font as tkfont
-from PIL import Image, ImageTk
-from typing import Optional, List, Tuple
+from typing import Optional, Tuple
 
 from input_handler import InputHandler
 from eye_tracker import EyeTracker, GestureType
@@ -34,6 +34,10 @@ class EyeTrackingGUI:
         self.show_video_var = tk.BooleanVar(value=True)  # Controls video display visibility
         self.mask_only_var = tk.BooleanVar(value=False)  # Controls mask-only mode
         
+        # Plain copies of the display toggles for the capture thread (Tk variables are UI-thread only)
+        self._show_video = True
+        self._mask_only = False
+        
         # Components (initialized on start)
         self.input_handler: Optional[InputHandler] = None
         self.eye_tracker: Optional[EyeTracker] = None
@@ -42,8 +46,37 @@ class EyeTrackingGUI:
         
         self.frame_label = None
         self.current_frame_bgr = None
+        self._ppm_buf = None  # Reused binary PPM (header + RGB pixels) handed to Tk
+        self._rgb_scratch = None  # View of the pixel part of _ppm_buf, the BGR->RGB conversion target
+        self._photo = None  # Displayed PhotoImage, updated in place with new PPM data
+        self._src_size = None  # (width, height) of the frames being displayed
+        self._target_size = None  # Display size for _src_size, refreshed on label resize
+        
+        # Latest-frame handoff from the capture thread to the UI thread
+        self._pending_frame = None
+        self._displayed_frame = None  # Frame the UI thread is currently reading
+        self._pending_lock = threading.Lock()
+        self._update_scheduled = False
+        
+        # Double-buffered canvases the capture thread draws into in mask-only mode,
+        # with the region each one was last drawn over so clearing stays cheap
+        self._vis_bufs = [None, None]
+        self._vis_dirty = [None, None]
+        (text_w, text_h), baseline = cv2.getTextSize("No face detected", cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+        self._no_face_region = (slice(max(0, 60 - text_h - 2), 60 + baseline + 2), slice(28, 30 + text_w + 2))
+        
+        # "No face detected" rasterized once on black over _no_face_region for the mask-only canvas
+        rows, cols = self._no_face_region
+        text_canvas = np.zeros((rows.stop, cols.stop, 3), dtype=np.uint8)
+        cv2.putText(text_canvas, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        self._no_face_overlay = text_canvas[self._no_face_region].copy()
+        
+        # Status messages and stop requests from the capture thread, applied by _pump_status
+        self._status_q = queue.Queue()
+        self._stop_requested = False
         
         self._build_ui()
+        self.root.after(100, self._pump_status)
         
     def _init_scaling_and_theme(self):
         # DPI-aware scaling
@@ -111,6 +144,7 @@ class EyeTrackingGUI:
         video_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self.frame_label = ttk.Label(video_frame)
         self.frame_label.pack(fill=tk.BOTH, expand=True)
+        self.frame_label.bind('<Configure>', self._on_label_resize)
         
     def _browse_video(self):
         path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov;*.mkv"), ("All Files", "*.*")])
@@ -127,6 +161,7 @@ class EyeTrackingGUI:
             return
         
         self.running = True
+        self._stop_requested = False
         self.status_var.set("Starting...")
         
         # Initialize components
@@ -141,7 +176,12 @@ class EyeTrackingGUI:
         self.eye_tracker = EyeTracker(ear_threshold=self.ear_threshold_var.get())
         self.eye_tracker.set_frame_dimensions(width, height)
         self.visualizer = Visualizer(width, height)
-        self.data_logger = DataLogger()
+        # Parquet writes happen on the logger's own thread, off the capture loop
+        self.data_logger = DataLogger(background_writes=True)
+        
+        # Allocate the mask-only canvases once for the capture size
+        self._vis_bufs = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._vis_dirty = [None, None]
         
         # Start capture thread
         self.capture_thread = threading.Thread(target=self._run_loop, daemon=True)
@@ -173,14 +213,16 @@ class EyeTrackingGUI:
     
     def toggle_video_display(self):
         """Toggle video display visibility."""
-        if self.show_video_var.get():
+        self._show_video = self.show_video_var.get()
+        if self._show_video:
             self.frame_label.pack(fill=tk.BOTH, expand=True)
         else:
             self.frame_label.pack_forget()
     
     def toggle_mask_only(self):
         """Toggle mask-only mode."""
-        if self.mask_only_var.get():
+        self._mask_only = self.mask_only_var.get()
+        if self._mask_only:
             self.status_var.set("Mask-only mode enabled")
         else:
             self.status_var.set("Normal mode")
@@ -191,61 +233,187 @@ class EyeTrackingGUI:
         self.root.quit()
         self.root.destroy()
         
+    def _pump_status(self):
+        """Apply stop requests and status messages queued by the capture thread (runs on the UI thread)."""
+        if self._stop_requested:
+            self._stop_requested = False
+            self.stop()
+        try:
+            while True:
+                self.status_var.set(self._status_q.get_nowait())
+        except queue.Empty:
+            pass
+        self.root.after(100, self._pump_status)
+    
+    def _post_frame(self, frame_bgr):
+        """Hand a frame to the UI thread, replacing any frame not yet displayed."""
+        with self._pending_lock:
+            self._pending_frame = frame_bgr
+            if self._update_scheduled:
+                return
+            self._update_scheduled = True
+        self.root.after_idle(self._drain_pending)
+    
+    def _drain_pending(self):
+        """Display the most recent pending frame (runs on the UI thread)."""
+        with self._pending_lock:
+            frame_bgr = self._pending_frame
+            self._pending_frame = None
+            self._displayed_frame = frame_bgr
+            self._update_scheduled = False
+        if frame_bgr is None:
+            return
+        try:
+            self._update_frame(frame_bgr)
+        finally:
+            with self._pending_lock:
+                self._displayed_frame = None
+    
+    def _acquire_vis_buffer(self, frame_bgr, region=None):
+        """
+        Return a black canvas the UI thread is not reading.
+        
+        Args:
+            frame_bgr: Captured frame whose shape the canvas must match
+            region: (rows, cols) slices the caller is about to draw into, or None for the whole frame
+            
+        Returns:
+            Black frame owned by the capture thread until it is posted
+        """
+        with self._pending_lock:
+            for i, buf in enumerate(self._vis_bufs):
+                if buf is None or buf.shape != frame_bgr.shape:
+                    buf = self._vis_bufs[i] = np.zeros_like(frame_bgr)
+                    self._vis_dirty[i] = None
+                    break
+                if buf is not self._displayed_frame and buf is not self._pending_frame:
+                    break
+            else:
+                # One buffer is on screen and the other is still pending: reclaim the pending one
+                buf = self._pending_frame
+                self._pending_frame = None
+                i = 0 if buf is self._vis_bufs[0] else 1
+        
+        # Zero only what was drawn last time this canvas was used
+        dirty = self._vis_dirty[i]
+        if dirty is Ellipsis:
+            buf.fill(0)
+        elif dirty is not None:
+            buf[dirty].fill(0)
+        self._vis_dirty[i] = Ellipsis if region is None else region
+        return buf
+    
+    def _draw_no_face(self, frame_bgr, on_black: bool = False):
+        """
+        Draw the "No face detected" text onto the frame.
+        
+        Args:
+            frame_bgr: Frame to draw on
+            on_black: Whether the text region is known to be black (mask-only canvas)
+        """
+        roi = frame_bgr[self._no_face_region]
+        if on_black and roi.shape == self._no_face_overlay.shape:
+            # The region is black, so the pre-rendered text can be copied in as is
+            roi[...] = self._no_face_overlay
+        else:
+            cv2.putText(frame_bgr, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+    
+    def _fit_to_label(self, label_w: int, label_h: int) -> Tuple[int, int]:
+        """Return the largest size with the source aspect ratio that fits the label."""
+        src_w, src_h = self._src_size
+        label_w = label_w or src_w
+        label_h = label_h or src_h
+        scale = min(label_w / src_w, label_h / src_h)
+        return max(1, int(src_w * scale)), max(1, int(src_h * scale))
+    
+    def _on_label_resize(self, event):
+        """Recompute the cached display size when the video label changes size."""
+        if self._src_size is not None:
+            self._target_size = self._fit_to_label(event.width, event.height)
+    
     def _update_frame(self, frame_bgr):
         # Only update if video display is enabled
-        if not self.show_video_var.get():
+        if not self._show_video:
             return
             
-        # Convert BGR to RGB for display
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        image = Image.fromarray(frame_rgb)
-        # Resize to fit label while preserving aspect with high-quality filter
-        label_w = self.frame_label.winfo_width() or image.width
-        label_h = self.frame_label.winfo_height() or image.height
-        if label_w > 0 and label_h > 0:
-            src_w, src_h = image.size
-            scale = min(label_w / src_w, label_h / src_h)
-            new_w = max(1, int(src_w * scale))
-            new_h = max(1, int(src_h * scale))
-            image = image.resize((new_w, new_h), Image.LANCZOS)
-        photo = ImageTk.PhotoImage(image=image)
-        
-        # Keep reference
-        self.frame_label.photo = photo
-        self.frame_label.configure(image=photo)
+        # Resize to fit label while preserving aspect, on the ndarray with OpenCV
+        src_h, src_w = frame_bgr.shape[:2]
+        if self._src_size != (src_w, src_h):
+            self._src_size = (src_w, src_h)
+            self._target_size = None
+        if self._target_size is None:
+            self._target_size = self._fit_to_label(self.frame_label.winfo_width(), self.frame_label.winfo_height())
+        new_w, new_h = self._target_size
+        if (new_w, new_h) != (src_w, src_h):
+            interpolation = cv2.INTER_AREA if new_w < src_w else cv2.INTER_LINEAR
+            frame_bgr = cv2.resize(frame_bgr, (new_w, new_h), interpolation=interpolation)
+        
+        # Convert BGR to RGB straight into the pixel area of a reused PPM buffer
+        if self._rgb_scratch is None or self._rgb_scratch.shape != frame_bgr.shape:
+            h, w = frame_bgr.shape[:2]
+            header = b'P6\n%d %d\n255\n' % (w, h)
+            self._ppm_buf = bytearray(len(header) + frame_bgr.nbytes)
+            self._ppm_buf[:len(header)] = header
+            self._rgb_scratch = np.frombuffer(self._ppm_buf, dtype=np.uint8, offset=len(header)).reshape(h, w, 3)
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._rgb_scratch)
+        
+        # Tk decodes PPM natively, so no PIL image is built
+        ppm_data = bytes(self._ppm_buf)
+        if self._photo is None:
+            self._photo = tk.PhotoImage(master=self.root, data=ppm_data, format='PPM')
+            # Keep reference
+            self.frame_label.photo = self._photo
+            self.frame_label.configure(image=self._photo)
+        else:
+            # Replace the image data in place; the photo resizes itself to match
+            self._photo.configure(data=ppm_data, format='PPM')
         
     def _run_loop(self):
-        fps_list = []
-        last_time = 0.0
+        # FPS is measured over blocks of frames so the overlay only changes a few times per second
+        fps_block = 15
+        block_start = 0.0
+        block_frames = 0
+        avg_fps = 0.0
         frame_count = 0
         
         try:
             while self.running:
+                # Webcam reads return the newest frame (InputHandler's grabber thread drops unread
+                # ones), so a slow tracker skips ahead instead of working through a backlog;
+                # video files are read sequentially
                 success, frame = self.input_handler.read_frame()
                 if not success:
                     if self.input_handler.is_video_file():
-                        self.status_var.set("End of video reached")
+                        self._status_q.put("End of video reached")
                     break
                 
                 frame_count += 1
                 now = time.time()
-                if last_time != 0:
-                    fps = 1.0 / (now - last_time)
-                    fps_list.append(fps)
-                    if len(fps_list) > 30:
-                        fps_list.pop(0)
-                last_time = now
-                avg_fps = sum(fps_list) / len(fps_list) if fps_list else 0.0
+                if block_start == 0:
+                    block_start = now
+                else:
+                    block_frames += 1
+                    if block_frames >= fps_block:
+                        avg_fps = block_frames / (now - block_start)
+                        block_start = now
+                        block_frames = 0
                 
                 eye_data = self.eye_tracker.process_frame(frame, now)
                 if eye_data is not None:
-                    # Log
                     self.data_logger.log_eye_data(eye_data, frame_count, avg_fps)
-                    
+                else:
+                    self.data_logger.log_no_face_detected(frame_count, avg_fps)
+                
+                # With the video hidden only tracking and logging run
+                if not self._show_video:
+                    continue
+                mask_only = self._mask_only
+                
+                if eye_data is not None:
                     # Create base frame for visualization
-                    if self.mask_only_var.get():
+                    if mask_only:
                         # Mask-only mode: black background with landmarks and overlays
-                        base_frame = np.zeros_like(frame)
+                        base_frame = self._acquire_vis_buffer(frame)
                     else:
                         # Normal mode: original frame
                         base_frame = frame
@@ -258,64 +426,56 @@ class EyeTrackingGUI:
                         gaze_history,
                         avg_fps,
                         False,
-                        self.mask_only_var.get()
+                        mask_only
                     )
                 else:
-                    self.data_logger.log_no_face_detected(frame_count, avg_fps)
-                    if self.mask_only_var.get():
-                        vis_frame = np.zeros_like(frame)
-                        cv2.putText(vis_frame, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                    if mask_only:
+                        vis_frame = self._acquire_vis_buffer(frame, self._no_face_region)
                     else:
                         vis_frame = frame
-                        cv2.putText(vis_frame, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                    self._draw_no_face(vis_frame, mask_only)
                 
                 self.current_frame_bgr = vis_frame
-                self.root.after(0, self._update_frame, vis_frame.copy())
+                # Hand over the reference: camera frames are fresh each read and canvases are double-buffered
+                self._post_frame(vis_frame)
                 
-            self.stop()
         except Exception as e:
-            self.status_var.set(f"Error: {e}")
-            self.stop()
+            self._status_q.put(f"Error: {e}")
+        # Stopping joins this thread, so leave it to the UI thread (unless it is already stopping)
+        if self.running:
+            self._stop_requested = True
 
-    def _apply_privacy_mask(self, frame_bgr, landmarks: Optional[List[Tuple[int, int]]]):
+    def _apply_privacy_mask(self, frame_bgr, landmarks: Optional[np.ndarray]):
         # If landmarks are unavailable, just blur entire face region is not possible; blur whole frame
-        if not landmarks or len(landmarks) == 0:
+        if landmarks is None or len(landmarks) == 0:
             return cv2.GaussianBlur(frame_bgr, (31, 31), 0)
 
         h, w = frame_bgr.shape[:2]
+        landmarks_np = np.asarray(landmarks)
 
-        # Build blurred background
-        blurred = cv2.GaussianBlur(frame_bgr, (51, 51), 0)
-
-        # Compute eye bounding boxes from known indices
-        def bbox_from_indices(indices: List[int]):
-            pts = [(x, y) for i, (x, y) in enumerate(landmarks) if i in indices]
-            if not pts:
-                return None
-            xs = [p[0] for p in pts]
-            ys = [p[1] for p in pts]
-            x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
-            # Add margin
-            mx = int(0.25 * (x2 - x1 + 1))
-            my = int(0.5 * (y2 - y1 + 1))
-            x1 = max(0, x1 - mx)
-            y1 = max(0, y1 - my)
-            x2 = min(w - 1, x2 + mx)
-            y2 = min(h - 1, y2 + my)
-            return x1, y1, x2, y2
+        # Build blurred background at quarter resolution, then upsample back
+        half = cv2.pyrDown(frame_bgr)
+        small = cv2.GaussianBlur(cv2.pyrDown(half), (7, 7), 0)
+        blurred = cv2.pyrUp(cv2.pyrUp(small, dstsize=(half.shape[1], half.shape[0])), dstsize=(w, h))
 
-        left_box = bbox_from_indices(EyeTracker.LEFT_EYE_INDICES)
-        right_box = bbox_from_indices(EyeTracker.RIGHT_EYE_INDICES)
-
-        # Start with blurred frame, then paste original eye regions back
-        output = blurred.copy()
-        for box in [left_box, right_box]:
-            if box is None:
+        # Compute eye bounding boxes (with margin) from known indices
+        boxes = []
+        for eye_idx in (EyeTracker.LEFT_EYE_IDX_ARR, EyeTracker.RIGHT_EYE_IDX_ARR):
+            pts = landmarks_np[eye_idx[eye_idx < len(landmarks_np)]]
+            if len(pts) == 0:
                 continue
-            x1, y1, x2, y2 = box
-            output[y1:y2, x1:x2] = frame_bgr[y1:y2, x1:x2]
+            lo, hi = pts.min(axis=0), pts.max(axis=0)
+            margin = ((hi - lo + 1) * (0.25, 0.5)).astype(np.int64)
+            x1, y1 = np.maximum(lo - margin, 0)
+            x2, y2 = np.minimum(hi + margin, (w - 1, h - 1))
+            boxes.append((x1, y1, x2, y2))
+
+        # Paste original eye regions back into the blurred frame; slicing touches only the
+        # eye pixels, where a full-frame mask with cv2.copyTo would scan every pixel again
+        for x1, y1, x2, y2 in boxes:
+            blurred[y1:y2, x1:x2] = frame_bgr[y1:y2, x1:x2]
 
-        return output
+        return blurred
 
 
 def main():
@@ -1,5 +1,6 @@
 import cv2
 import os
+import threading
 from typing import Optional, Tuple
 
 
@@ -20,6 +21,18 @@ class InputHandler:
         self.frame_width = 0
         self.frame_height = 0
         
+        # Latest-frame slot filled by the webcam grabber thread
+        self._latest_lock = threading.Lock()
+        self._latest_cond = threading.Condition(self._latest_lock)
+        self._latest_frame = None
+        self._latest_seq = 0
+        self._read_seq = 0
+        self._grab_failed = False
+        self._grab_exited = False
+        self._grab_owns_release = False
+        self._grab_stop = threading.Event()
+        self._grab_thread: Optional[threading.Thread] = None
+        
     def initialize(self) -> bool:
         """
         Initialize the video source.
@@ -33,6 +46,9 @@ class InputHandler:
                 if not self.cap.isOpened():
                     print("Error: Could not open webcam")
                     return False
+                # Keep only the newest frame in the driver queue so reads are not stale
+                if not self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+                    print("Warning: Could not set webcam buffer size; frames may lag")
             elif self.source == "video":
                 if not self.video_path or not os.path.exists(self.video_path):
                     print(f"Error: Video file not found: {self.video_path}")
@@ -49,6 +65,10 @@ class InputHandler:
             self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
+            # Webcams are drained continuously so reads always get the newest frame
+            if self.source == "webcam":
+                self._start_grabber()
+            
             print(f"Initialized {self.source} source: {self.frame_width}x{self.frame_height}")
             return True
             
@@ -56,15 +76,64 @@ class InputHandler:
             print(f"Error initializing input handler: {e}")
             return False
     
+    def _start_grabber(self):
+        """Start the background thread that keeps the latest-frame slot filled."""
+        self._grab_stop.clear()
+        self._grab_failed = False
+        self._grab_exited = False
+        self._grab_owns_release = False
+        self._latest_frame = None
+        self._latest_seq = 0
+        self._read_seq = 0
+        self._grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._grab_thread.start()
+    
+    def _grab_loop(self):
+        """Continuously grab frames, decoding only the one that is kept."""
+        cap = self.cap
+        try:
+            while not self._grab_stop.is_set():
+                ok = cap.grab()
+                if ok:
+                    ok, frame = cap.retrieve()
+                if not ok:
+                    return
+                with self._latest_cond:
+                    self._latest_frame = frame
+                    self._latest_seq += 1
+                    self._latest_cond.notify_all()
+        finally:
+            # Wake readers on any exit, including an exception, so read_frame never waits forever
+            with self._latest_cond:
+                self._grab_failed = True
+                self._grab_exited = True
+                owns_release = self._grab_owns_release
+                self._latest_cond.notify_all()
+            if owns_release:
+                cap.release()
+    
     def read_frame(self) -> Tuple[bool, Optional[cv2.Mat]]:
         """
         Read the next frame from the video source.
         
+        For webcams this blocks until the grabber thread has produced a frame
+        newer than the last one returned, so the same frame is never returned twice.
+        
         Returns:
             Tuple of (success, frame) where frame is None if unsuccessful
         """
         if self.cap is None:
             return False, None
+        
+        if self._grab_thread is not None:
+            with self._latest_cond:
+                self._latest_cond.wait_for(
+                    lambda: self._latest_seq != self._read_seq or self._grab_failed or self._grab_stop.is_set()
+                )
+                if self._latest_seq == self._read_seq:
+                    return False, None
+                self._read_seq = self._latest_seq
+                return True, self._latest_frame
             
         ret, frame = self.cap.read()
         if not ret:
@@ -90,6 +159,19 @@ class InputHandler:
     
     def release(self):
         """Release the video capture resource."""
+        if self._grab_thread is not None:
+            self._grab_stop.set()
+            with self._latest_cond:
+                self._latest_cond.notify_all()
+            self._grab_thread.join(timeout=2.0)
+            self._grab_thread = None
+            with self._latest_cond:
+                if not self._grab_exited:
+                    # The grabber is still blocked in grab(); releasing the capture under it
+                    # is unsafe, so the thread releases it when grab() returns
+                    self._grab_owns_release = True
+                    print("Warning: Capture thread did not stop; camera will be released when it does")
+                    self.cap = None
         if self.cap is not None:
             self.cap.release()
             self.cap = None
@@ -5,6 +5,7 @@ Main application that integrates all modules for real-time eye tracking.
 """
 
 import cv2
+import numpy as np
 import time
 import argparse
 import sys
@@ -41,9 +42,14 @@ class EyeTrackingApp:
         self.frame_count = 0
         self.total_blinks = 0
         self.gesture_counts = {gesture.value: 0 for gesture in GestureType}
-        self.fps_history = []
         self.show_debug = False
         
+        # FPS ring buffer over the last 30 measurements with a running sum
+        self._fps_buf = np.zeros(30, dtype=np.float64)
+        self._fps_idx = 0
+        self._fps_count = 0
+        self._fps_sum = 0.0
+        
         # Performance tracking
         self.start_time = 0
         self.last_fps_time = 0
@@ -77,6 +83,10 @@ class EyeTrackingApp:
         
         return True
     
+    def _average_fps(self) -> float:
+        """Mean of the recent FPS measurements (0 before the first one)."""
+        return self._fps_sum / self._fps_count if self._fps_count else 0
+    
     def process_frame(self, frame) -> Optional[dict]:
         """
         Process a single frame.
@@ -95,12 +105,13 @@ class EyeTrackingApp:
             self.last_fps_time = current_time
         else:
             fps = 1.0 / (current_time - self.last_fps_time)
-            self.fps_history.append(fps)
-            if len(self.fps_history) > 30:  # Keep last 30 FPS measurements
-                self.fps_history.pop(0)
+            self._fps_sum += fps - self._fps_buf[self._fps_idx]
+            self._fps_buf[self._fps_idx] = fps
+            self._fps_idx = (self._fps_idx + 1) % len(self._fps_buf)
+            self._fps_count = min(self._fps_count + 1, len(self._fps_buf))
             self.last_fps_time = current_time
         
-        avg_fps = sum(self.fps_history) / len(self.fps_history) if self.fps_history else 0
+        avg_fps = self._average_fps()
         
         # Process frame with eye tracker
         eye_data = self.eye_tracker.process_frame(frame, current_time)
@@ -155,7 +166,10 @@ class EyeTrackingApp:
             self.eye_tracker.reset_metrics()
             self.total_blinks = 0
             self.gesture_counts = {gesture.value: 0 for gesture in GestureType}
-            self.fps_history.clear()
+            self._fps_buf.fill(0.0)
+            self._fps_idx = 0
+            self._fps_count = 0
+            self._fps_sum = 0.0
             print("Metrics reset")
         elif key == ord('d') or key == ord('D'):
             # Toggle debug view
@@ -226,7 +240,7 @@ class EyeTrackingApp:
         
         # Calculate session statistics
         session_duration = time.time() - self.start_time
-        avg_fps = sum(self.fps_history) / len(self.fps_history) if self.fps_history else 0
+        avg_fps = self._average_fps()
         
         # Log session summary
         self.data_logger.log_session_summary(
@@ -264,6 +278,9 @@ def main():
     parser.add_argument('--path', type=str, help='Path to video file (required if source is video)')
     parser.add_argument('--ear-threshold', type=float, default=0.25,
                        help='EAR threshold for blink detection (default: 0.25)')
+    parser.add_argument('--motion-threshold', type=float, default=0.0,
+                       help='Skip face mesh inference when the mean frame change is below this '
+                            'gray level (default: 0, disabled)')
     
     args = parser.parse_args()
     
@@ -275,6 +292,7 @@ def main():
     # Create and run application
     app = EyeTrackingApp(args.source, args.path)
     app.eye_tracker.ear_threshold = args.ear_threshold
+    app.eye_tracker.motion_threshold = args.motion_threshold
     
     try:
         app.run()
@@ -3,6 +3,31 @@ import numpy as np
 from typing import List, Tuple, Optional
 from eye_tracker import EyeData, GestureType
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; draw_gaze_history then uses NumPy
+    njit = None
+
+
+def _trail_kernel(hist, width, height, out_pts):
+    """
+    Compute pixel points for a gaze trail.
+    
+    Args:
+        hist: (N, 2) float32 normalized gaze points, oldest first
+        width: Frame width as float32
+        height: Frame height as float32
+        out_pts: (>=N, 2) int32 array receiving pixel points
+    """
+    n = hist.shape[0]
+    for i in range(n):
+        out_pts[i, 0] = np.int32(hist[i, 0] * width)
+        out_pts[i, 1] = np.int32(hist[i, 1] * height)
+
+
+if njit is not None:
+    _trail_kernel = njit(cache=True)(_trail_kernel)
+
 
 class Visualizer:
     """Handles visualization of eye tracking data."""
@@ -34,6 +59,54 @@ class Visualizer:
         self.font_scale = 0.6
         self.font_thickness = 2
         
+        # Solid background for the metrics panel ROI, blended against each frame
+        self._panel_fill = np.empty((191, 281, 3), dtype=np.uint8)
+        self._panel_fill[:] = self.colors['background']
+        
+        # Metrics panel text styles: title, then (font scale, thickness, color) per metric line
+        self._metric_title_style = (0.7, 2, self.colors['text'])
+        self._metric_styles = [
+            (0.5, 1, (0, 255, 255)),   # FPS in cyan
+            (0.4, 1, (255, 255, 0)),   # Left EAR in yellow
+            (0.4, 1, (255, 255, 0)),   # Right EAR in yellow
+            (0.4, 1, self.colors['text']),
+            (0.4, 1, self.colors['text']),
+            (0.4, 1, self.colors['text'])
+        ]
+        # Baseline y of each metric line, 25 px apart
+        self._metric_ys = list(range(55, 55 + len(self._metric_styles) * 25, 25))
+        
+        # Gesture indicator text, size and x position per gesture, measured once
+        self._gesture_labels = {}
+        for gesture in GestureType:
+            text = f"GESTURE: {gesture.value.upper()}"
+            text_size = cv2.getTextSize(text, self.font, self.font_scale * 1.0, self.font_thickness)[0]
+            self._gesture_labels[gesture] = (text, text_size, self.frame_width - text_size[0] - 20)
+        
+        # Gaze trail scale and output buffer for the trail kernel (grown on demand)
+        self._trail_scale = np.array([frame_width, frame_height], dtype=np.float32)
+        self._trail_pts = np.empty((32, 2), dtype=np.int32)
+        if njit is not None:
+            # Pay the JIT compile (or cache load) here rather than on the first frame
+            _trail_kernel(np.zeros((2, 2), dtype=np.float32), self._trail_scale[0], self._trail_scale[1],
+                          self._trail_pts)
+        
+        # Segment thicknesses per trail length (thicker towards the newest point);
+        # the tracker keeps 30 points, longer trails are added on first use
+        self._trail_tables = {n: self._trail_thicknesses(n) for n in range(2, 31)}
+        
+        # Eye-region landmark indices (left eye region, then right eye region)
+        self._landmark_idx = np.r_[33:161, 362:398]
+        
+        # Debug-view landmark dot (filled radius 2) as pixel offsets
+        stamp = np.zeros((9, 9), dtype=np.uint8)
+        cv2.circle(stamp, (4, 4), 2, 255, -1)
+        ys, xs = np.nonzero(stamp)
+        self._dot_offsets = np.stack([xs - 4, ys - 4], axis=1)
+        
+        # Debug view canvas, reused and cleared on every call
+        self._debug_frame = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
+        
     def draw_landmarks(self, frame: np.ndarray, eye_data: EyeData) -> np.ndarray:
         """
         Draw eye landmarks on the frame.
@@ -106,27 +179,36 @@ class Visualizer:
         Returns:
             Frame with gaze history trail
         """
-        if len(gaze_history) < 2:
+        n = len(gaze_history)
+        if n < 2:
             return frame
         
+        # Scale all points to pixels once instead of twice per segment
+        hist = np.ascontiguousarray(gaze_history, dtype=np.float32)
+        if njit is not None:
+            if n > len(self._trail_pts):
+                self._trail_pts = np.empty((n, 2), dtype=np.int32)
+            _trail_kernel(hist, self._trail_scale[0], self._trail_scale[1], self._trail_pts)
+            pts = self._trail_pts[:n].tolist()
+        else:
+            pts = (hist * self._trail_scale).astype(np.int32).tolist()
+        
+        thicknesses = self._trail_tables.get(n)
+        if thicknesses is None:
+            thicknesses = self._trail_tables[n] = self._trail_thicknesses(n)
+        
         # Draw trail with fading opacity
-        for i in range(1, len(gaze_history)):
-            alpha = i / len(gaze_history)
-            thickness = max(1, int(3 * alpha))
-            
-            pt1 = (
-                int(gaze_history[i-1][0] * self.frame_width),
-                int(gaze_history[i-1][1] * self.frame_height)
-            )
-            pt2 = (
-                int(gaze_history[i][0] * self.frame_width),
-                int(gaze_history[i][1] * self.frame_height)
-            )
-            
-            cv2.line(frame, pt1, pt2, self.colors['gaze_line'], thickness)
+        color = self.colors['gaze_line']
+        for i in range(1, n):
+            cv2.line(frame, pts[i - 1], pts[i], color, thicknesses[i - 1])
         
         return frame
     
+    @staticmethod
+    def _trail_thicknesses(n: int) -> List[int]:
+        """Return the thickness of each of the n - 1 segments of an n-point gaze trail."""
+        return np.maximum(1, (3 * np.arange(1, n) / n).astype(np.int32)).tolist()
+    
     def draw_metrics(self, frame: np.ndarray, eye_data: EyeData, fps: float = 0.0, mask_only: bool = False) -> np.ndarray:
         """
         Draw tracking metrics on the frame.
@@ -140,32 +222,19 @@ class Visualizer:
         Returns:
             Frame with metrics overlay
         """
-        # Create metrics overlay with better styling
-        overlay = frame.copy()
-        
-        # Semi-transparent background with rounded corners effect - compact size
-        cv2.rectangle(overlay, (10, 10), (290, 200), self.colors['background'], -1)
+        # Metrics panel region (10,10)-(290,200) inclusive; only this ROI is touched
+        roi = frame[10:201, 10:291]
         if mask_only:
             # In mask-only mode, don't blend - just draw solid background
-            cv2.rectangle(frame, (10, 10), (290, 200), self.colors['background'], -1)
+            roi[:] = self.colors['background']
         else:
-            cv2.addWeighted(overlay, 0.8, frame, 0.2, 0, frame)
-        
-        # Enhanced font settings - compact
-        font_scale_large = 0.7
-        font_scale_medium = 0.5
-        font_scale_small = 0.4
-        thickness_large = 2
-        thickness_medium = 1
-        thickness_small = 1
+            # Semi-transparent background, blended in place over the ROI
+            background = self._panel_fill[:roi.shape[0], :roi.shape[1]]
+            cv2.addWeighted(background, 0.8, roi, 0.2, 0, dst=roi)
         
         # Title
-        cv2.putText(frame, "Eye Tracking Metrics", (20, 35), self.font, font_scale_large, 
-                   self.colors['text'], thickness_large)
-        
-        # Metrics with better formatting - compact spacing
-        y_offset = 55
-        line_height = 25
+        scale, thickness, color = self._metric_title_style
+        cv2.putText(frame, "Eye Tracking Metrics", (20, 35), self.font, scale, color, thickness)
         
         metrics = [
             f"FPS: {fps:.1f}",
@@ -176,24 +245,9 @@ class Visualizer:
             f"Gesture: {eye_data.gesture.value.replace('_', ' ').title()}"
         ]
         
-        for i, metric in enumerate(metrics):
-            # Use different font sizes for different types of info
-            if i == 0:  # FPS
-                font_scale = font_scale_medium
-                thickness = thickness_medium
-                color = (0, 255, 255)  # Cyan for FPS
-            elif i < 3:  # EAR values
-                font_scale = font_scale_small
-                thickness = thickness_small
-                color = (255, 255, 0)  # Yellow for EAR
-            else:  # Other metrics
-                font_scale = font_scale_small
-                thickness = thickness_small
-                color = self.colors['text']
-            
-            cv2.putText(frame, metric, (20, y_offset), self.font, font_scale, 
-                       color, thickness)
-            y_offset += line_height
+        # Metrics with better formatting - compact spacing (styles and rows precomputed)
+        for metric, (font_scale, thickness, color), y in zip(metrics, self._metric_styles, self._metric_ys):
+            cv2.putText(frame, metric, (20, y), self.font, font_scale, color, thickness)
         
         return frame
     
@@ -212,11 +266,9 @@ class Visualizer:
             return frame
         
         # Draw gesture indicator in top-right corner
-        indicator_text = f"GESTURE: {gesture.value.upper()}"
-        text_size = cv2.getTextSize(indicator_text, self.font, self.font_scale * 1.0, self.font_thickness)[0]
+        indicator_text, text_size, x = self._gesture_labels[gesture]
         
         # Background for gesture indicator
-        x = self.frame_width - text_size[0] - 20
         y = 50
         cv2.rectangle(frame, (x - 10, y - text_size[1] - 10), 
                      (x + text_size[0] + 10, y + 10), self.colors['gesture'], -1)
@@ -260,13 +312,21 @@ class Visualizer:
         if eye_data.landmarks is None:
             return frame
         
-        # Create debug frame
-        debug_frame = np.zeros((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        # Clear the reused debug frame, reallocating it if the input frame size changed
+        shape = frame.shape[:2] + (3,)
+        if self._debug_frame.shape != shape:
+            self._debug_frame = np.zeros(shape, dtype=np.uint8)
+        else:
+            self._debug_frame.fill(0)
+        debug_frame = self._debug_frame
         
-        # Draw face mesh landmarks
-        for i, landmark in enumerate(eye_data.landmarks):
-            if i in range(33, 161) or i in range(362, 398):  # Eye regions
-                cv2.circle(debug_frame, landmark, 2, self.colors['landmark'], -1)
+        # Draw eye-region landmarks as dots in a single pixel write
+        landmarks = np.asarray(eye_data.landmarks)
+        idx = self._landmark_idx[self._landmark_idx < len(landmarks)]
+        coords = (landmarks[idx, None, :] + self._dot_offsets).reshape(-1, 2)
+        h, w = debug_frame.shape[:2]
+        inside = (coords[:, 0] >= 0) & (coords[:, 0] < w) & (coords[:, 1] >= 0) & (coords[:, 1] < h)
+        debug_frame[coords[inside, 1], coords[inside, 0]] = self.colors['landmark']
         
         # Draw gaze indicators
         debug_frame = self.draw_gaze(debug_frame, eye_data)
@@ -335,6 +395,10 @@ class Visualizer:
             frame = self.draw_blink_indicator(frame, eye_data.is_blinking)
             frame = self.draw_gesture_indicator(frame, eye_data.gesture)
         
+        # Overlays stay on the CPU even when cv2.ocl.useOpenCL() is true: OpenCV's
+        # circle/line/putText have no OpenCL kernels, and the metrics-panel blend
+        # works on a NumPy ROI view that a UMat would have to map back anyway
+
         # Always draw metrics and instructions
         frame = self.draw_metrics(frame, eye_data, fps, mask_only)
         frame = self.draw_instructions(frame)
@@ -1,5 +1,6 @@
+import queue
 import threading
-import time
+from time import perf_counter_ns
 from typing import Optional, List, Tuple
 
 import cv2
@@ -14,6 +15,13 @@ from data_logger import DataLogger
 
 app = Flask(__name__)
 
+# Baseline (non-progressive, non-optimized Huffman) JPEG at quality 75 keeps per-frame encode cheap
+JPEG_PARAMS = [
+    int(cv2.IMWRITE_JPEG_QUALITY), 75,
+    int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+    int(cv2.IMWRITE_JPEG_OPTIMIZE), 0
+]
+
 
 class StreamState:
     def __init__(self):
@@ -24,12 +32,35 @@ class StreamState:
         self.eye_tracker: Optional[EyeTracker] = None
         self.visualizer: Optional[Visualizer] = None
         self.data_logger: Optional[DataLogger] = None
-        self.frame_bgr = None
         # No privacy toggle; always render standard overlays
         self.source = 'webcam'
         self.video_path: Optional[str] = None
         self.avg_fps = 0.0
 
+        # Tracking and rendering run on separate threads: the tracking loop hands
+        # (frame, eye_data, gaze_history, fps) to the encode thread, which publishes
+        # the latest JPEG for all clients
+        self._vis_q: queue.Queue = queue.Queue(maxsize=2)
+        self._encode_thread: Optional[threading.Thread] = None
+        self._encode_stop = threading.Event()
+        # Video files are decoded on a capture thread into a small queue so decoding
+        # overlaps tracking; webcams already read through InputHandler's grabber thread
+        self._cap_q: queue.Queue = queue.Queue(maxsize=2)
+        self._cap_thread: Optional[threading.Thread] = None
+        self._cap_stop = threading.Event()
+        # The latest JPEG is published under _jpeg_lock by swapping the bytes reference;
+        # no buffer copies are needed
+        self._jpeg_lock = threading.Lock()
+        self.jpeg_bytes: Optional[bytes] = None
+        self.jpeg_seq = 0
+        # Signalled on every publish; a Condition rather than an Event so that each
+        # client waits for a sequence number newer than its own without clearing it for others
+        self._frame_ready = threading.Condition(self._jpeg_lock)
+
+        # Number of connected /video_feed clients; overlays and encoding only run while > 0
+        self._subs = 0
+        self._subs_lock = threading.Lock()
+
     def start(self, source: str = 'webcam', video_path: Optional[str] = None, ear_threshold: float = 0.25):
         with self.lock:
             if self.running:
@@ -61,7 +92,8 @@ class StreamState:
         self.eye_tracker = None
         self.visualizer = None
         self.data_logger = None
-        self.frame_bgr = None
+        with self._jpeg_lock:
+            self.jpeg_bytes = None
 
     # Removed privacy mask function; standard rendering only
 
@@ -77,41 +109,174 @@ class StreamState:
             self.visualizer = Visualizer(width, height)
             self.data_logger = DataLogger()
 
-            fps_list = []
-            last_time = 0.0
+            self._encode_stop.clear()
+            self._encode_thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self._encode_thread.start()
+
+            if self.input_handler.is_video_file():
+                self._cap_stop.clear()
+                self._cap_thread = threading.Thread(target=self._capture_loop, daemon=True)
+                self._cap_thread.start()
+                read_frame = self._read_queued_frame
+            else:
+                read_frame = self.input_handler.read_frame
+
+            # Frame intervals (ns) over the last 30 frames with a running sum;
+            # avg_fps is refreshed every 10 frames
+            fps_buf = np.zeros(30, dtype=np.int64)
+            fps_idx = 0
+            fps_count = 0
+            fps_sum = 0
+            last_ns = 0
             frame_idx = 0
 
             while self.running:
-                ok, frame = self.input_handler.read_frame()
+                ok, frame = read_frame()
                 if not ok:
                     break
                 frame_idx += 1
-                now = time.time()
-                if last_time != 0:
-                    fps = 1.0 / (now - last_time)
-                    fps_list.append(fps)
-                    if len(fps_list) > 30:
-                        fps_list.pop(0)
-                last_time = now
-                self.avg_fps = sum(fps_list) / len(fps_list) if fps_list else 0.0
-
-                eye_data = self.eye_tracker.process_frame(frame, now)
+                now_ns = perf_counter_ns()
+                if last_ns != 0:
+                    delta = now_ns - last_ns
+                    fps_sum += delta - int(fps_buf[fps_idx])
+                    fps_buf[fps_idx] = delta
+                    fps_idx = (fps_idx + 1) % len(fps_buf)
+                    fps_count = min(fps_count + 1, len(fps_buf))
+                last_ns = now_ns
+                if frame_idx % 10 == 0 and fps_sum > 0:
+                    self.avg_fps = fps_count * 1e9 / fps_sum
+
+                eye_data = self.eye_tracker.process_frame(frame, now_ns * 1e-9)
                 if eye_data is not None:
                     self.data_logger.log_eye_data(eye_data, frame_idx, self.avg_fps)
-                    # Apply privacy mask to raw frame first, then draw overlays so they stay sharp
-                    vis = self.visualizer.visualize_frame(
-                        frame, eye_data, self.eye_tracker.get_gaze_history(), self.avg_fps, False
-                    )
+                    gaze_history = self.eye_tracker.get_gaze_history()
                 else:
                     self.data_logger.log_no_face_detected(frame_idx, self.avg_fps)
-                    vis = frame
-                    cv2.putText(vis, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                    gaze_history = None
 
-                self.frame_bgr = vis
+                # Tracking and logging always run; rendering is skipped with nobody watching
+                if self._subs == 0:
+                    continue
+
+                # Hand off to the encode thread, dropping the oldest pending frame if it is behind
+                item = (frame, eye_data, gaze_history, self.avg_fps)
+                try:
+                    self._vis_q.put_nowait(item)
+                except queue.Full:
+                    try:
+                        self._vis_q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._vis_q.put_nowait(item)
 
         finally:
+            self._stop_capture()
+            self._stop_encoder()
             self._cleanup()
 
+    def _capture_loop(self):
+        """Decode video frames ahead of the tracking loop; None marks the end of the stream."""
+        while not self._cap_stop.is_set():
+            ok, frame = self.input_handler.read_frame()
+            item = frame if ok else None
+            # Block rather than drop so every video frame is tracked and logged
+            while not self._cap_stop.is_set():
+                try:
+                    self._cap_q.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            if not ok:
+                return
+
+    def _read_queued_frame(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Take the next decoded frame from the capture thread.
+
+        Returns:
+            Tuple of (success, frame)
+        """
+        while self.running:
+            try:
+                frame = self._cap_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            return frame is not None, frame
+        return False, None
+
+    def _encode_loop(self):
+        """Render overlays and JPEG-encode frames handed over by the tracking loop."""
+        while not self._encode_stop.is_set():
+            try:
+                frame, eye_data, gaze_history, avg_fps = self._vis_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if eye_data is not None:
+                vis = self.visualizer.visualize_frame(frame, eye_data, gaze_history, avg_fps, False)
+            else:
+                vis = frame
+                cv2.putText(vis, "No face detected", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+
+            ret, buffer = cv2.imencode('.jpg', vis, JPEG_PARAMS)
+            if not ret:
+                continue
+            # Publish by swapping references; each encoded frame is an immutable bytes object
+            jpg = buffer.tobytes()
+            with self._jpeg_lock:
+                self.jpeg_bytes = jpg
+                self.jpeg_seq += 1
+                self._frame_ready.notify_all()
+
+    def subscribe(self):
+        """Register a connected video client."""
+        with self._subs_lock:
+            self._subs += 1
+
+    def unsubscribe(self):
+        """Unregister a video client that disconnected."""
+        with self._subs_lock:
+            self._subs -= 1
+
+    def wait_for_jpeg(self, last_seq: int, timeout: float = 1.0) -> Tuple[Optional[bytes], int]:
+        """
+        Wait until a JPEG newer than last_seq is published.
+        
+        Args:
+            last_seq: Sequence number of the last frame the caller sent
+            timeout: Maximum time to wait in seconds
+            
+        Returns:
+            Tuple of (jpeg bytes or None, sequence number); the sequence number equals
+            last_seq if nothing new arrived before the timeout
+        """
+        with self._frame_ready:
+            self._frame_ready.wait_for(lambda: self.jpeg_bytes is not None and self.jpeg_seq != last_seq, timeout)
+            return self.jpeg_bytes, self.jpeg_seq
+
+    def _stop_capture(self):
+        """Stop the capture thread before the input is released."""
+        self._cap_stop.set()
+        if self._cap_thread is not None:
+            self._cap_thread.join(timeout=2.0)
+        self._cap_thread = None
+        while True:
+            try:
+                self._cap_q.get_nowait()
+            except queue.Empty:
+                break
+
+    def _stop_encoder(self):
+        """Stop the encode thread and discard frames it has not rendered yet."""
+        self._encode_stop.set()
+        if self._encode_thread is not None:
+            self._encode_thread.join(timeout=2.0)
+        self._encode_thread = None
+        while True:
+            try:
+                self._vis_q.get_nowait()
+            except queue.Empty:
+                break
+
 
 stream = StreamState()
 
@@ -126,17 +291,19 @@ def _jpeg_generator():
     if not stream.running:
         stream.start('webcam', None)
 
-    while True:
-        frame = stream.frame_bgr
-        if frame is None:
-            time.sleep(0.01)
-            continue
-        ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-        if not ret:
-            continue
-        jpg = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + jpg + b'\r\n')
+    stream.subscribe()
+    try:
+        last_seq = -1
+        while True:
+            # Frames are encoded once on the stream's encode thread; wake on each new one
+            jpg, seq = stream.wait_for_jpeg(last_seq)
+            if jpg is None or seq == last_seq:
+                continue
+            last_seq = seq
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpg + b'\r\n')
+    finally:
+        stream.unsubscribe()
 
 
 @app.route('/video_feed')
@@ -162,6 +329,10 @@ def control():
 
 if __name__ == '__main__':
     # Run with: python web_app.py, then open http://127.0.0.1:5000/
-    app.run(host='127.0.0.1', port=5000, debug=False, threaded=True)
+    try:
+        app.run(host='127.0.0.1', port=5000, debug=False, threaded=True)
+    finally:
+        # Stop the stream on Ctrl-C too so the session log is closed and readable
+        stream.stop()
 
 